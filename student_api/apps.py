@@ -3,3 +3,7 @@ from django.apps import AppConfig
 class StudentApiConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'student_api'
+
+    def ready(self):
+        from .partitioning import connect_signals
+        connect_signals(self)
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from student_api.partitioning import rebalance_students
+
+
+class Command(BaseCommand):
+    help = "Move students onto the partition their course or enrollment year maps to."
+
+    def handle(self, *args, **options):
+        moved = rebalance_students()
+        self.stdout.write(self.style.SUCCESS(f"Moved {moved} student(s)."))
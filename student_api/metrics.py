@@ -0,0 +1,322 @@
+import atexit
+import fcntl
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+import uuid
+from bisect import bisect_left
+from contextlib import ExitStack, suppress
+
+from django.conf import settings
+from django.db import connections
+from django.utils.functional import SimpleLazyObject
+
+logger = logging.getLogger(__name__)
+
+# ===================================================
+# 📈 METRIC DEFINITIONS
+# ===================================================
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100)
+BYTES_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576)
+
+# name -> (help text, buckets)
+HISTOGRAMS = {
+    'student_api_request_duration_seconds': ("Request latency in seconds.", LATENCY_BUCKETS),
+    'student_api_db_queries': ("Database queries issued per request.", QUERY_COUNT_BUCKETS),
+    'student_api_db_duration_seconds': ("Time spent in database queries per request.", LATENCY_BUCKETS),
+    'student_api_response_bytes': ("Response body size in bytes.", BYTES_BUCKETS),
+}
+
+# name -> help text
+COUNTERS = {
+    'student_api_requests_total': "Requests handled.",
+    'student_api_auth_failures_total': "Requests rejected with 401 or 403.",
+}
+
+
+def _config():
+    conf = getattr(settings, 'STUDENT_API_METRICS', {})
+    return conf.get('DIR'), conf.get('FLUSH_INTERVAL', 5.0)
+
+
+# ===================================================
+# 🧮 PER-PROCESS STORE
+# ===================================================
+
+class MetricsStore:
+    """
+    In-process counters and histograms keyed by metric name and URL name.
+
+    Each process only ever touches its own store, so the lock is held for a
+    handful of list updates. When a metrics directory is configured a
+    background thread dumps the store to ``<dir>/metrics_<pid>_<token>.json``
+    every FLUSH_INTERVAL seconds (and once more at exit), and the exposition
+    view sums every file it finds, which aggregates across worker processes.
+    Dumps of exited workers are folded into ``metrics_exited.json`` on the next
+    scrape, so counters never go backwards and the directory stays small.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.counters = {}
+        self.histograms = {}
+        self._flusher_pid = None
+        self.filename = None
+
+    def inc(self, name, view, amount=1):
+        key = (name, view)
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0) + amount
+
+    def observe(self, name, view, value):
+        buckets = HISTOGRAMS[name][1]
+        key = (name, view)
+        index = bisect_left(buckets, value)
+        with self._lock:
+            hist = self.histograms.get(key)
+            if hist is None:
+                # bucket counts, then +Inf count, then sum
+                hist = self.histograms[key] = [0] * (len(buckets) + 2)
+            hist[index] += 1
+            hist[-1] += value
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                'counters': {f"{n}|{v}": c for (n, v), c in self.counters.items()},
+                'histograms': {f"{n}|{v}": list(h) for (n, v), h in self.histograms.items()},
+            }
+
+    def start_flusher(self):
+        """Start the dump thread once per process; forked workers get their own."""
+        directory, interval = _config()
+        pid = os.getpid()
+        if not directory or self._flusher_pid == pid:
+            return
+        with self._lock:
+            if self._flusher_pid == pid:
+                return
+            self._flusher_pid = pid
+            # The token keeps a reused pid from overwriting an exited worker's file.
+            self.filename = f"metrics_{pid}_{uuid.uuid4().hex[:8]}.json"
+        thread = threading.Thread(
+            target=self._flush_loop, args=(directory, interval),
+            name='student-api-metrics', daemon=True,
+        )
+        thread.start()
+        atexit.register(self.flush, directory)
+
+    def _flush_loop(self, directory, interval):
+        while True:
+            time.sleep(interval)
+            self.flush(directory)
+
+    def flush(self, directory):
+        """Atomically replace this process's dump. Never raises."""
+        tmp_path = None
+        try:
+            os.makedirs(directory, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.metrics_', suffix='.tmp')
+            with os.fdopen(fd, 'w') as fh:
+                json.dump(self.snapshot(), fh)
+            os.replace(tmp_path, os.path.join(directory, self.filename))
+        except OSError:
+            logger.exception("Could not write metrics to %s", directory)
+            if tmp_path:
+                with suppress(OSError):
+                    os.remove(tmp_path)
+
+
+store = MetricsStore()
+
+
+# ===================================================
+# 🧾 AGGREGATION + TEXT EXPOSITION
+# ===================================================
+
+def _merge(total, snap):
+    for key, value in snap.get('counters', {}).items():
+        total['counters'][key] = total['counters'].get(key, 0) + value
+    for key, values in snap.get('histograms', {}).items():
+        current = total['histograms'].get(key)
+        if current is None or len(current) != len(values):
+            total['histograms'][key] = list(values)
+        else:
+            total['histograms'][key] = [a + b for a, b in zip(current, values)]
+
+
+EXITED_FILE = 'metrics_exited.json'
+
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass  # exists, but belongs to another user
+    return True
+
+
+def _dump_pid(filename):
+    # metrics_<pid>_<token>.json -> pid, or None for anything else.
+    parts = filename[:-len('.json')].split('_')
+    if len(parts) == 3 and parts[0] == 'metrics' and parts[1].isdigit():
+        return int(parts[1])
+    return None
+
+
+def _read_dump(path):
+    try:
+        with open(path) as fh:
+            return json.load(fh)
+    except (OSError, ValueError):
+        return None
+
+
+def _compact_exited(directory):
+    """Fold the dumps of exited workers into EXITED_FILE and delete them."""
+    with open(os.path.join(directory, '.metrics.lock'), 'w') as lock:
+        # Only one scraper may compact at a time or a dump gets counted twice.
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        exited = [
+            filename for filename in os.listdir(directory)
+            if (pid := _dump_pid(filename)) is not None and not _pid_alive(pid)
+        ]
+        if not exited:
+            return
+        exited_path = os.path.join(directory, EXITED_FILE)
+        total = _read_dump(exited_path) or {'counters': {}, 'histograms': {}}
+        for filename in exited:
+            snap = _read_dump(os.path.join(directory, filename))
+            if snap is not None:
+                _merge(total, snap)
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.metrics_', suffix='.tmp')
+        with os.fdopen(fd, 'w') as fh:
+            json.dump(total, fh)
+        os.replace(tmp_path, exited_path)
+        for filename in exited:
+            with suppress(OSError):
+                os.remove(os.path.join(directory, filename))
+
+
+def collect():
+    """Sum the live store with every other process's dumped snapshot."""
+    total = {'counters': {}, 'histograms': {}}
+    own_file = store.filename
+    directory, _ = _config()
+    if directory and os.path.isdir(directory):
+        try:
+            _compact_exited(directory)
+        except OSError:
+            logger.exception("Could not compact metrics in %s", directory)
+        for filename in os.listdir(directory):
+            if not filename.endswith('.json') or filename == own_file:
+                continue
+            snap = _read_dump(os.path.join(directory, filename))
+            if snap is not None:
+                _merge(total, snap)
+    _merge(total, store.snapshot())
+    return total
+
+
+def _format_value(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def render_text():
+    """Render the aggregated metrics in the Prometheus text exposition format."""
+    data = collect()
+    lines = []
+
+    for name, help_text in COUNTERS.items():
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} counter")
+        for key in sorted(data['counters']):
+            metric, view = key.split('|', 1)
+            if metric == name:
+                lines.append(f'{name}{{view="{view}"}} {_format_value(data["counters"][key])}')
+
+    for name, (help_text, buckets) in HISTOGRAMS.items():
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} histogram")
+        for key in sorted(data['histograms']):
+            metric, view = key.split('|', 1)
+            if metric != name:
+                continue
+            hist = data['histograms'][key]
+            cumulative = 0
+            for bound, count in zip(buckets, hist):
+                cumulative += count
+                lines.append(f'{name}_bucket{{view="{view}",le="{bound}"}} {cumulative}')
+            cumulative += hist[len(buckets)]
+            lines.append(f'{name}_bucket{{view="{view}",le="+Inf"}} {cumulative}')
+            lines.append(f'{name}_sum{{view="{view}"}} {_format_value(hist[-1])}')
+            lines.append(f'{name}_count{{view="{view}"}} {cumulative}')
+
+    return "\n".join(lines) + "\n"
+
+
+# ===================================================
+# 🧩 MIDDLEWARE
+# ===================================================
+
+class QueryTimer:
+    """``execute_wrapper`` hook that counts and times queries on every alias."""
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.duration += time.perf_counter() - start
+            self.count += 1
+
+
+def _student_api_url_names():
+    from . import urls
+    return frozenset(p.name for p in urls.urlpatterns if p.name)
+
+
+STUDENT_API_URL_NAMES = SimpleLazyObject(_student_api_url_names)
+
+
+class MetricsMiddleware:
+    """Records per-request metrics for every URL served by ``student_api``."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        store.start_flusher()
+        timer = QueryTimer()
+        start = time.perf_counter()
+        with ExitStack() as stack:
+            for alias in connections:
+                stack.enter_context(connections[alias].execute_wrapper(timer))
+            response = self.get_response(request)
+        elapsed = time.perf_counter() - start
+
+        match = getattr(request, 'resolver_match', None)
+        if match is None or match.url_name not in STUDENT_API_URL_NAMES:
+            return response
+        view = match.url_name
+
+        store.inc('student_api_requests_total', view)
+        if response.status_code in (401, 403):
+            store.inc('student_api_auth_failures_total', view)
+        store.observe('student_api_request_duration_seconds', view, elapsed)
+        store.observe('student_api_db_queries', view, timer.count)
+        store.observe('student_api_db_duration_seconds', view, timer.duration)
+        if not response.streaming:
+            store.observe('student_api_response_bytes', view, len(response.content))
+        return response
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.7 on 2026-10-19 12:14
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('student_api', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='student',
+            name='version',
+            field=models.PositiveIntegerField(default=1),
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.7 on 2026-10-19 12:15
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('student_api', '0002_student_version'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StudentIdSequence',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+            ],
+        ),
+    ]
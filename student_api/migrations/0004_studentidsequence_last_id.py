@@ -0,0 +1,34 @@
+# Generated by Django 5.2.7 on 2026-10-19 13:02
+
+from django.db import migrations, models
+
+
+def collapse_to_single_row(apps, schema_editor):
+    # The allocator shipped with 0003 inserted one row per student. Keep a
+    # single counter row instead, starting above every id already handed out.
+    # Partition aliases skip this: the router refuses app-level operations there.
+    db_alias = schema_editor.connection.alias
+    StudentIdSequence = apps.get_model('student_api', 'StudentIdSequence')
+    Student = apps.get_model('student_api', 'Student')
+    highest = max(
+        StudentIdSequence.objects.using(db_alias).aggregate(models.Max('pk'))['pk__max'] or 0,
+        Student.objects.using(db_alias).aggregate(models.Max('pk'))['pk__max'] or 0,
+    )
+    StudentIdSequence.objects.using(db_alias).all().delete()
+    StudentIdSequence.objects.using(db_alias).create(pk=1, last_id=highest)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('student_api', '0003_studentidsequence'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='studentidsequence',
+            name='last_id',
+            field=models.BigIntegerField(default=0),
+        ),
+        migrations.RunPython(collapse_to_single_row, migrations.RunPython.noop),
+    ]
@@ -1,4 +1,6 @@
 from django.db import models
+from django.db.models import F
+from .partitioning import PartitionedStudentManager, partition_for_student
 
 class Course(models.Model):
     course_name = models.CharField(max_length=100, unique=True)
@@ -19,6 +21,57 @@ class Student(models.Model):
     enrollment_date = models.DateField(auto_now_add=True, null=True)
     phone_number = models.CharField(max_length=15, blank=True, null=True)
     address = models.TextField(blank=True, null=True)
+    version = models.PositiveIntegerField(default=1)
+
+    objects = PartitionedStudentManager()
 
     def __str__(self):
         return self.name
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        student = super().from_db(db, field_names, values)
+        if 'course_id' in student.__dict__ and 'enrollment_date' in student.__dict__:
+            student._loaded_partition = partition_for_student(student)
+        return student
+
+    def check_partition_unchanged(self):
+        # A row stays on the alias it was created on, so a course or
+        # enrollment date change that maps to another partition would strand it.
+        loaded = getattr(self, '_loaded_partition', None)
+        if loaded is not None and partition_for_student(self) != loaded:
+            raise ValueError(
+                "Changing course or enrollment date would move this student to another partition."
+            )
+
+    def save(self, *args, **kwargs):
+        if not self._state.adding:
+            self.check_partition_unchanged()
+        super().save(*args, **kwargs)
+
+    def conditional_update(self, expected_version, fields):
+        """
+        Write ``fields`` with a single ``UPDATE ... WHERE id=? AND version=?``.
+
+        Returns False (and writes nothing) if another request bumped the
+        version first; on success the in-memory version is advanced.
+        """
+        self.check_partition_unchanged()
+        values = {}
+        for name in fields:
+            attname = self._meta.get_field(name).attname
+            values[attname] = getattr(self, attname)
+        updated = Student.objects.using(self._state.db).filter(pk=self.pk, version=expected_version).update(
+            version=F('version') + 1, **values
+        )
+        if updated:
+            self.version = expected_version + 1
+        return bool(updated)
+
+
+class StudentIdSequence(models.Model):
+    """
+    Single-row counter handing out Student ids that stay unique across
+    partition databases. Only the row with pk=1 is used.
+    """
+    last_id = models.BigIntegerField(default=0)
@@ -0,0 +1,252 @@
+import copy
+import heapq
+from datetime import date
+from itertools import islice
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, models, transaction
+from django.db.models import F, Max
+from django.db.models.functions import Greatest
+from django.db.models.signals import post_delete, post_migrate, post_save, pre_save
+
+
+# ===================================================
+# ⚙️ CONFIGURATION
+# ===================================================
+#
+# STUDENT_PARTITIONS = {
+#     'KEY': 'course' | 'enrollment_year',
+#     'ALIASES': ['default', 'students_1', ...],
+# }
+#
+# Students live on ALIASES[key % len(ALIASES)]. Courses are a small reference
+# table: they are written to 'default' and mirrored to every other partition so
+# the Student -> Course foreign key resolves locally. When
+# `migrate --database=<alias>` runs, existing courses are copied into the
+# partition and existing students are moved to their partitions, so migrate
+# 'default' first. `manage.py rebalance_students` redoes the move after KEY or
+# ALIASES change.
+
+def partition_key_name():
+    return getattr(settings, 'STUDENT_PARTITIONS', {}).get('KEY', 'course')
+
+
+def partition_aliases():
+    return getattr(settings, 'STUDENT_PARTITIONS', {}).get('ALIASES', [DEFAULT_DB_ALIAS])
+
+
+def is_partitioned():
+    return len(partition_aliases()) > 1
+
+
+def partition_for(course_id=None, enrollment_year=None):
+    """Return the DB alias holding students with the given partition key."""
+    aliases = partition_aliases()
+    key = course_id if partition_key_name() == 'course' else enrollment_year
+    if key is None:
+        return aliases[0]
+    return aliases[key % len(aliases)]
+
+
+def partition_for_student(student):
+    enrolled = student.enrollment_date or date.today()
+    return partition_for(course_id=student.course_id, enrollment_year=enrolled.year)
+
+
+# ===================================================
+# 🔀 PARTITION-AWARE QUERYSET + MANAGER
+# ===================================================
+
+class StudentQuerySet(models.QuerySet):
+
+    def create(self, **kwargs):
+        # QuerySet.create() saves with using=self.db, which the router only
+        # sees without the instance, so pick the partition here.
+        student = self.model(**kwargs)
+        student.save(force_insert=True, using=self._db or partition_for_student(student))
+        return student
+
+    def partitions(self):
+        """One copy of this queryset per partition alias."""
+        return [self.using(alias) for alias in partition_aliases()]
+
+    def for_course(self, course_id):
+        """
+        List the students of one course ordered by id. Only one partition is
+        queried when keyed by course.
+        """
+        if partition_key_name() == 'course':
+            alias = partition_for(course_id=course_id)
+            return list(self.using(alias).filter(course_id=course_id).order_by('pk'))
+        return self.fan_out(course_id=course_id)
+
+    def fan_out(self, **filters):
+        """Run the same filter on every partition and merge the rows by id."""
+        results = [qs.filter(**filters).order_by('pk') for qs in self.partitions()]
+        return list(heapq.merge(*results, key=lambda student: student.pk))
+
+    def get_any(self, **lookup):
+        """``get()`` across partitions; raises DoesNotExist if no partition has it."""
+        for qs in self.partitions():
+            student = qs.filter(**lookup).first()
+            if student is not None:
+                return student
+        raise self.model.DoesNotExist(f"No student matches {lookup}.")
+
+    def keyset_page(self, after=None, limit=50, **filters):
+        """
+        Return ``(students, next_after)`` ordered by id.
+
+        Each partition is asked for at most ``limit`` rows past ``after`` and
+        the sorted streams are merged, so no partition is ever fully scanned.
+        ``next_after`` is None on the last page.
+        """
+        pages = []
+        for qs in self.partitions():
+            qs = qs.filter(**filters)
+            if after is not None:
+                qs = qs.filter(pk__gt=after)
+            pages.append(qs.order_by('pk')[:limit])
+        students = list(islice(heapq.merge(*pages, key=lambda student: student.pk), limit))
+        next_after = students[-1].pk if len(students) == limit else None
+        return students, next_after
+
+
+PartitionedStudentManager = models.Manager.from_queryset(StudentQuerySet)
+
+
+# ===================================================
+# 🧭 DATABASE ROUTER
+# ===================================================
+
+class StudentPartitionRouter:
+    """
+    Sends new Student rows to their partition. Existing rows keep the alias
+    they were loaded from (Django falls back to ``instance._state.db``), and
+    everything else stays on 'default'.
+    """
+
+    def db_for_write(self, model, **hints):
+        instance = hints.get('instance')
+        if model._meta.label == 'student_api.Student' and isinstance(instance, model):
+            if instance._state.adding:
+                return partition_for_student(instance)
+        return None
+
+    def allow_relation(self, obj1, obj2, **hints):
+        aliases = partition_aliases()
+        if (obj1._meta.app_label == obj2._meta.app_label == 'student_api'
+                and obj1._state.db in aliases and obj2._state.db in aliases):
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        if db == DEFAULT_DB_ALIAS or db not in partition_aliases():
+            return None
+        # Partition databases only carry Student and its Course reference table.
+        return app_label == 'student_api' and model_name in ('student', 'course')
+
+
+# ===================================================
+# 📡 SIGNAL HANDLERS (connected in StudentApiConfig.ready)
+# ===================================================
+
+# Partition layout the id counter was last raised for in this process.
+_seeded_layout = None
+
+
+def next_student_id():
+    """Take the next id from the counter row on 'default'."""
+    global _seeded_layout
+    from .models import Student, StudentIdSequence
+    sequence = StudentIdSequence.objects.using(DEFAULT_DB_ALIAS)
+    layout = tuple(partition_aliases())
+    with transaction.atomic(using=DEFAULT_DB_ALIAS):
+        if _seeded_layout != layout:
+            # Students created before partitioning was switched on got their
+            # ids from autoincrement; start the counter above all of them.
+            highest = max(
+                Student.objects.using(alias).aggregate(highest=Max('pk'))['highest'] or 0
+                for alias in layout
+            )
+            sequence.get_or_create(pk=1)
+            sequence.filter(pk=1).update(last_id=Greatest('last_id', highest))
+        sequence.filter(pk=1).update(last_id=F('last_id') + 1)
+        student_id = sequence.values_list('last_id', flat=True).get(pk=1)
+    _seeded_layout = layout
+    return student_id
+
+
+def allocate_student_id(sender, instance, raw=False, **kwargs):
+    # Per-partition autoincrement would hand out the same id on every
+    # partition, so new students draw their id from 'default' instead.
+    if raw or instance.pk is not None or not is_partitioned():
+        return
+    instance.pk = next_student_id()
+
+
+def mirror_course_save(sender, instance, using, raw=False, **kwargs):
+    if raw or using != DEFAULT_DB_ALIAS:
+        return
+    for alias in partition_aliases():
+        if alias != DEFAULT_DB_ALIAS:
+            copy.copy(instance).save(using=alias)
+
+
+def mirror_course_delete(sender, instance, using, **kwargs):
+    if using != DEFAULT_DB_ALIAS:
+        return
+    for alias in partition_aliases():
+        if alias != DEFAULT_DB_ALIAS:
+            sender.objects.using(alias).filter(pk=instance.pk).delete()
+
+
+def rebalance_students(batch_size=500):
+    """
+    Move every student stored on the wrong alias to its partition and return
+    how many moved. Needed for rows created before partitioning was switched
+    on, or before KEY/ALIASES changed.
+    """
+    from .models import Student
+    moved = 0
+    for alias in partition_aliases():
+        misplaced = [
+            student for student in Student.objects.using(alias).order_by('pk').iterator()
+            if partition_for_student(student) != alias
+        ]
+        for start in range(0, len(misplaced), batch_size):
+            batch = misplaced[start:start + batch_size]
+            for student in batch:
+                target = partition_for_student(student)
+                # raw=True copies the row as-is (like loaddata): the id is kept,
+                # enrollment_date is not reset and no signal handlers run.
+                with transaction.atomic(using=target):
+                    student.save_base(using=target, raw=True, force_insert=True)
+            Student.objects.using(alias).filter(pk__in=[student.pk for student in batch]).delete()
+        moved += len(misplaced)
+    return moved
+
+
+def backfill_partition(sender, using, apps, **kwargs):
+    # Runs after `migrate --database=<alias>`: copy the courses created before
+    # the partition existed, then move the students that now belong there.
+    # Historical models carry no signals, so this does not re-trigger
+    # mirror_course_save.
+    if using == DEFAULT_DB_ALIAS or using not in partition_aliases():
+        return
+    try:
+        Course = apps.get_model('student_api', 'Course')
+    except LookupError:
+        return
+    existing = set(Course.objects.using(using).values_list('pk', flat=True))
+    missing = Course.objects.using(DEFAULT_DB_ALIAS).exclude(pk__in=existing)
+    Course.objects.using(using).bulk_create(list(missing))
+    rebalance_students()
+
+
+def connect_signals(app_config):
+    from .models import Course, Student
+    pre_save.connect(allocate_student_id, sender=Student, dispatch_uid='student_api.allocate_student_id')
+    post_save.connect(mirror_course_save, sender=Course, dispatch_uid='student_api.mirror_course_save')
+    post_delete.connect(mirror_course_delete, sender=Course, dispatch_uid='student_api.mirror_course_delete')
+    post_migrate.connect(backfill_partition, sender=app_config, dispatch_uid='student_api.backfill_partition')
@@ -1,9 +1,16 @@
-from rest_framework import serializers
+from rest_framework import serializers, status
+from rest_framework.exceptions import APIException
 from django.contrib.auth.models import User
 from rest_framework.authtoken.models import Token
 from .models import Student, Course
 import re
 
+class PreconditionFailed(APIException):
+    status_code = status.HTTP_412_PRECONDITION_FAILED
+    default_detail = "Student was modified by another request. Fetch it again and retry."
+    default_code = 'precondition_failed'
+
+
 # 🎓 Course Serializer
 class CourseSerializer(serializers.ModelSerializer):
     class Meta:
@@ -28,7 +35,26 @@ class StudentSerializer(serializers.ModelSerializer):
     class Meta:
         model = Student
         fields = '__all__'
-        read_only_fields = ['enrollment_date']
+        read_only_fields = ['enrollment_date', 'version']
+        # The unique index is per partition database, so uniqueness is
+        # checked across all partitions in validate_email instead.
+        extra_kwargs = {'email': {'validators': []}}
+
+    def update(self, instance, validated_data):
+        # Only write columns whose value actually changed, and only if nobody
+        # else has saved the row since it was read (optimistic locking).
+        expected_version = instance.version
+        changed = [
+            field for field, value in validated_data.items()
+            if getattr(instance, field) != value
+        ]
+        if not changed:
+            return instance
+        for field in changed:
+            setattr(instance, field, validated_data[field])
+        if not instance.conditional_update(expected_version, changed):
+            raise PreconditionFailed()
+        return instance
 
     def validate_name(self, value):
         if len(value.strip()) < 3:
@@ -46,6 +72,11 @@ class StudentSerializer(serializers.ModelSerializer):
         allowed_domains = ('.edu', '.ac.in', '.edu.in')
         if not value.endswith(allowed_domains):
             raise serializers.ValidationError("Email must end with .edu, .ac.in, or .edu.in.")
+        others = Student.objects.all()
+        if self.instance is not None:
+            others = others.exclude(pk=self.instance.pk)
+        if others.fan_out(email=value):
+            raise serializers.ValidationError("student with this email already exists.")
         return value
 
     def validate_phone_number(self, value):
@@ -65,12 +96,16 @@ class StudentMiniSerializer(serializers.ModelSerializer):
 
 
 class CourseDetailSerializer(serializers.ModelSerializer):
-    students = StudentMiniSerializer(many=True, read_only=True)
+    students = serializers.SerializerMethodField()
 
     class Meta:
         model = Course
         fields = ['id', 'course_name', 'course_code', 'students']
 
+    def get_students(self, course):
+        # The reverse relation would only see the course's own database.
+        return StudentMiniSerializer(Student.objects.for_course(course.pk), many=True).data
+
 
 # 👤 User Serializer (New)
 class UserSerializer(serializers.ModelSerializer):
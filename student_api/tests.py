@@ -1,3 +1,367 @@
-from django.test import TestCase
+import json
+import os
+import tempfile
+from datetime import date
+from unittest import mock
 
-# Create your tests here.
+from django.apps import apps
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+
+from . import metrics, partitioning
+from .models import Course, Student
+from .serializers import PreconditionFailed, StudentSerializer
+
+
+# ===================================================
+# 📈 METRICS
+# ===================================================
+
+class MetricsTests(TestCase):
+
+    def setUp(self):
+        self.store = metrics.MetricsStore()
+        patcher = mock.patch.object(metrics, 'store', self.store)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        self.admin = User.objects.create_superuser('admin', 'admin@uni.edu', 'pw')
+        self.client = APIClient()
+
+    def test_render_text_formats_counters_and_cumulative_buckets(self):
+        self.store.inc('student_api_requests_total', 'student-detail', 2)
+        self.store.observe('student_api_db_queries', 'student-detail', 1)
+        self.store.observe('student_api_db_queries', 'student-detail', 3)
+
+        text = metrics.render_text()
+
+        self.assertIn('# TYPE student_api_requests_total counter', text)
+        self.assertIn('student_api_requests_total{view="student-detail"} 2', text)
+        self.assertIn('student_api_db_queries_bucket{view="student-detail",le="1"} 1', text)
+        self.assertIn('student_api_db_queries_bucket{view="student-detail",le="5"} 2', text)
+        self.assertIn('student_api_db_queries_bucket{view="student-detail",le="+Inf"} 2', text)
+        self.assertIn('student_api_db_queries_sum{view="student-detail"} 4', text)
+        self.assertIn('student_api_db_queries_count{view="student-detail"} 2', text)
+
+    def test_middleware_records_requests_and_auth_failures(self):
+        self.client.get('/api/students/')
+        self.client.force_authenticate(self.admin)
+        self.client.get('/api/students/')
+
+        self.assertEqual(self.store.counters[('student_api_requests_total', 'student-list-create')], 2)
+        self.assertEqual(self.store.counters[('student_api_auth_failures_total', 'student-list-create')], 1)
+        hist = self.store.histograms[('student_api_request_duration_seconds', 'student-list-create')]
+        self.assertEqual(sum(hist[:-1]), 2)
+
+    def test_metrics_endpoint_is_admin_only(self):
+        user = User.objects.create_user('plain', 'plain@uni.edu', 'pw')
+        self.client.force_authenticate(user)
+        self.assertEqual(self.client.get('/api/metrics/').status_code, 403)
+
+        self.client.force_authenticate(self.admin)
+        response = self.client.get('/api/metrics/')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response['Content-Type'].startswith('text/plain; version=0.0.4'))
+
+    def test_collect_sums_other_process_dumps(self):
+        with tempfile.TemporaryDirectory() as directory, \
+                override_settings(STUDENT_API_METRICS={'DIR': directory}):
+            with open(os.path.join(directory, 'metrics_1_dead.json'), 'w') as fh:
+                json.dump({'counters': {'student_api_requests_total|student-detail': 5}, 'histograms': {}}, fh)
+            self.store.filename = 'metrics_2_live.json'
+            self.store.inc('student_api_requests_total', 'student-detail', 1)
+            self.store.flush(directory)
+
+            total = metrics.collect()
+
+        self.assertEqual(total['counters']['student_api_requests_total|student-detail'], 6)
+
+    def test_collect_folds_exited_workers_into_one_file(self):
+        dump = {'counters': {'student_api_requests_total|student-detail': 2}, 'histograms': {}}
+        with tempfile.TemporaryDirectory() as directory, \
+                override_settings(STUDENT_API_METRICS={'DIR': directory}), \
+                mock.patch('student_api.metrics._pid_alive', side_effect=lambda pid: pid == 1):
+            for filename in ('metrics_1_live.json', 'metrics_8001_a.json', 'metrics_8002_b.json'):
+                with open(os.path.join(directory, filename), 'w') as fh:
+                    json.dump(dump, fh)
+
+            first = metrics.collect()
+            second = metrics.collect()
+            files = sorted(f for f in os.listdir(directory) if f.endswith('.json'))
+
+        self.assertEqual(files, ['metrics_1_live.json', metrics.EXITED_FILE])
+        self.assertEqual(first['counters']['student_api_requests_total|student-detail'], 6)
+        self.assertEqual(second, first)
+
+    def test_flush_failure_does_not_raise(self):
+        self.store.filename = 'metrics_1_x.json'
+        with mock.patch('student_api.metrics.os.replace', side_effect=OSError), \
+                self.assertLogs('student_api.metrics', 'ERROR'):
+            with tempfile.TemporaryDirectory() as directory:
+                self.store.flush(directory)
+                self.assertEqual(os.listdir(directory), [])
+
+    def test_flush_cleanup_failure_does_not_raise(self):
+        self.store.filename = 'metrics_1_x.json'
+        with mock.patch('student_api.metrics.os.replace', side_effect=OSError), \
+                mock.patch('student_api.metrics.os.remove', side_effect=OSError), \
+                self.assertLogs('student_api.metrics', 'ERROR'):
+            with tempfile.TemporaryDirectory() as directory:
+                self.store.flush(directory)
+
+
+# ===================================================
+# 🔒 OPTIMISTIC CONCURRENCY
+# ===================================================
+
+class StudentOptimisticLockingTests(TestCase):
+
+    def setUp(self):
+        self.course = Course.objects.create(
+            course_name='Mathematics', course_code='MATH', description='Maths', duration_months=12,
+        )
+        self.student = Student.objects.create(name='Asha Rao', email='asha@uni.edu', age=20, course=self.course)
+        self.url = f'/api/students/{self.student.pk}/'
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.create_user('editor', 'editor@uni.edu', 'pw'))
+
+    def test_get_returns_version_as_etag(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response['ETag'], '"1"')
+
+    def test_patch_with_current_if_match_bumps_version(self):
+        response = self.client.patch(self.url, {'age': 21}, format='json', HTTP_IF_MATCH='"1"')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['ETag'], '"2"')
+        self.student.refresh_from_db()
+        self.assertEqual((self.student.age, self.student.version), (21, 2))
+
+    def test_stale_if_match_is_rejected(self):
+        Student.objects.filter(pk=self.student.pk).update(version=2)
+        response = self.client.patch(self.url, {'age': 21}, format='json', HTTP_IF_MATCH='"1"')
+        self.assertEqual(response.status_code, 412)
+        self.assertEqual(response.data, {'detail': PreconditionFailed.default_detail})
+
+    def test_weak_if_match_never_matches(self):
+        response = self.client.patch(self.url, {'age': 21}, format='json', HTTP_IF_MATCH='W/"1"')
+        self.assertEqual(response.status_code, 412)
+
+    def test_lost_race_raises_precondition_failed(self):
+        serializer = StudentSerializer(self.student, data={'age': 22}, partial=True)
+        self.assertTrue(serializer.is_valid())
+        # Another request commits between our read and our write.
+        Student.objects.filter(pk=self.student.pk).update(version=2)
+        with self.assertRaises(PreconditionFailed):
+            serializer.save()
+        self.student.refresh_from_db()
+        self.assertEqual(self.student.age, 20)
+
+    def test_patch_updates_only_changed_columns_in_one_query(self):
+        with CaptureQueriesContext(connection) as queries:
+            self.client.patch(self.url, {'age': 23, 'name': 'Asha Rao'}, format='json')
+        updates = [q['sql'] for q in queries.captured_queries if q['sql'].startswith('UPDATE')]
+        self.assertEqual(len(updates), 1)
+        self.assertIn('"age"', updates[0])
+        self.assertIn('"version" = 1', updates[0].split('WHERE')[1])
+        self.assertNotIn('"name"', updates[0])
+
+
+# ===================================================
+# 📄 STUDENT LIST PAGINATION
+# ===================================================
+
+class StudentListPaginationTests(TestCase):
+
+    def setUp(self):
+        course = Course.objects.create(
+            course_name='Mathematics', course_code='MATH', description='Maths', duration_months=12,
+        )
+        self.ids = [
+            Student.objects.create(name='Asha Rao', email=f's{index}@uni.edu', age=20, course=course).pk
+            for index in range(60)
+        ]
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.create_user('viewer', 'viewer@uni.edu', 'pw'))
+
+    def test_single_database_without_params_returns_full_list(self):
+        response = self.client.get('/api/students/')
+        self.assertEqual([s['id'] for s in response.data], self.ids)
+
+    def test_limit_and_after_return_a_keyset_page(self):
+        response = self.client.get('/api/students/?limit=2')
+        self.assertEqual([s['id'] for s in response.data['results']], self.ids[:2])
+        self.assertEqual(response.data['next_after'], self.ids[1])
+
+        response = self.client.get(f'/api/students/?limit=5&after={self.ids[-3]}')
+        self.assertEqual([s['id'] for s in response.data['results']], self.ids[-2:])
+        self.assertIsNone(response.data['next_after'])
+
+    def test_after_without_limit_uses_default_page_size(self):
+        response = self.client.get(f'/api/students/?after={self.ids[0]}')
+        self.assertEqual([s['id'] for s in response.data['results']], self.ids[1:51])
+        self.assertEqual(response.data['next_after'], self.ids[50])
+
+    def test_invalid_limit_or_after_is_rejected(self):
+        for query in ('limit=abc', 'after=abc', 'limit=0', 'limit=201'):
+            with self.subTest(query=query):
+                self.assertEqual(self.client.get(f'/api/students/?{query}').status_code, 400)
+
+
+# ===================================================
+# 🗂️ PARTITIONING
+# ===================================================
+
+PARTITIONS = ['default', 'students_1']
+
+
+@override_settings(STUDENT_PARTITIONS={'KEY': 'course', 'ALIASES': PARTITIONS})
+class StudentPartitioningTests(TestCase):
+    databases = {'default', 'students_1'}
+
+    def setUp(self):
+        patcher = mock.patch.object(partitioning, '_seeded_layout', None)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        self.courses = [
+            Course.objects.create(
+                course_name=f'Course {code}', course_code=code, description='-', duration_months=6,
+            )
+            for code in ('C1', 'C2')
+        ]
+
+    def create_student(self, index, course):
+        return Student.objects.create(name='Asha Rao', email=f's{index}@uni.edu', age=20, course=course)
+
+    def test_create_routes_by_course(self):
+        for index, course in enumerate(self.courses):
+            student = self.create_student(index, course)
+            expected = PARTITIONS[course.pk % 2]
+            self.assertEqual(student._state.db, expected)
+            self.assertTrue(Student.objects.using(expected).filter(pk=student.pk).exists())
+
+    def test_create_routes_by_enrollment_year(self):
+        with override_settings(STUDENT_PARTITIONS={'KEY': 'enrollment_year', 'ALIASES': PARTITIONS}):
+            students = [self.create_student(index, course) for index, course in enumerate(self.courses)]
+        expected = PARTITIONS[date.today().year % 2]
+        self.assertEqual({student._state.db for student in students}, {expected})
+
+    def test_ids_are_unique_across_partitions(self):
+        students = [self.create_student(index, self.courses[index % 2]) for index in range(4)]
+        self.assertEqual({student._state.db for student in students}, set(PARTITIONS))
+        ids = [student.pk for student in students]
+        self.assertEqual(ids, sorted(set(ids)))
+
+    def test_id_sequence_starts_above_existing_students(self):
+        with override_settings(STUDENT_PARTITIONS={'KEY': 'course', 'ALIASES': ['default']}):
+            existing = [self.create_student(index, self.courses[0]) for index in range(3)]
+        student = self.create_student(3, self.courses[1])
+        self.assertGreater(student.pk, max(s.pk for s in existing))
+
+    def test_fan_out_and_keyset_page_merge_by_id(self):
+        ids = [self.create_student(index, self.courses[index % 2]).pk for index in range(5)]
+
+        self.assertEqual([s.pk for s in Student.objects.fan_out()], ids)
+
+        page, next_after = Student.objects.keyset_page(limit=2)
+        self.assertEqual(([s.pk for s in page], next_after), (ids[:2], ids[1]))
+        page, next_after = Student.objects.keyset_page(after=ids[3], limit=2)
+        self.assertEqual(([s.pk for s in page], next_after), (ids[4:], None))
+
+    def test_get_any_searches_every_partition(self):
+        students = [self.create_student(index, course) for index, course in enumerate(self.courses)]
+        for student in students:
+            self.assertEqual(Student.objects.get_any(pk=student.pk)._state.db, student._state.db)
+        with self.assertRaises(Student.DoesNotExist):
+            Student.objects.get_any(pk=max(s.pk for s in students) + 1)
+
+    def test_for_course_returns_list_for_either_key(self):
+        student = self.create_student(0, self.courses[0])
+        self.assertEqual(Student.objects.for_course(self.courses[0].pk), [student])
+        with override_settings(STUDENT_PARTITIONS={'KEY': 'enrollment_year', 'ALIASES': PARTITIONS}):
+            self.assertEqual(Student.objects.for_course(self.courses[0].pk), [student])
+
+    def test_courses_are_mirrored_to_partitions(self):
+        course = self.courses[0]
+        self.assertTrue(Course.objects.using('students_1').filter(pk=course.pk).exists())
+        course.delete()
+        self.assertFalse(Course.objects.using('students_1').filter(pk=course.pk).exists())
+
+    def test_migrating_a_partition_backfills_courses(self):
+        with override_settings(STUDENT_PARTITIONS={'KEY': 'course', 'ALIASES': ['default']}):
+            course = Course.objects.create(
+                course_name='Course Late', course_code='LATE', description='-', duration_months=6,
+            )
+        self.assertFalse(Course.objects.using('students_1').filter(pk=course.pk).exists())
+
+        partitioning.backfill_partition(sender=None, using='students_1', apps=apps)
+
+        self.assertTrue(Course.objects.using('students_1').filter(pk=course.pk).exists())
+
+    def test_migrating_a_partition_moves_existing_students(self):
+        # Students created while everything lived on 'default'.
+        with override_settings(STUDENT_PARTITIONS={'KEY': 'course', 'ALIASES': ['default']}):
+            existing = [self.create_student(index, self.courses[index % 2]) for index in range(4)]
+        Student.objects.filter(pk=existing[0].pk).update(enrollment_date=date(2020, 1, 1))
+
+        partitioning.backfill_partition(sender=None, using='students_1', apps=apps)
+
+        for course in self.courses:
+            expected = [s.pk for s in existing if s.course_id == course.pk]
+            alias = PARTITIONS[course.pk % 2]
+            self.assertEqual([s.pk for s in Student.objects.for_course(course.pk)], expected)
+            self.assertEqual(
+                sorted(Student.objects.using(alias).values_list('pk', flat=True)), expected,
+            )
+        moved = Student.objects.get_any(pk=existing[0].pk)
+        self.assertEqual(moved.enrollment_date, date(2020, 1, 1))
+        self.assertEqual(partitioning.rebalance_students(), 0)
+
+    def test_email_must_be_unique_across_partitions(self):
+        student = self.create_student(0, self.courses[1])
+        serializer = StudentSerializer(data={'name': 'Ravi Kumar', 'email': student.email, 'age': 22})
+        self.assertFalse(serializer.is_valid())
+        self.assertIn('email', serializer.errors)
+
+    def test_course_detail_lists_students_from_their_partition(self):
+        course = self.courses[1]
+        student = self.create_student(0, course)
+        client = APIClient()
+        client.force_authenticate(User.objects.create_user('viewer', 'viewer@uni.edu', 'pw'))
+        response = client.get(f'/api/courses/{course.pk}/')
+        self.assertEqual([s['id'] for s in response.data['students']], [student.pk])
+
+    def test_generic_views_read_every_partition(self):
+        students = [self.create_student(index, self.courses[index % 2]) for index in range(4)]
+        self.assertEqual({student._state.db for student in students}, set(PARTITIONS))
+        client = APIClient()
+        client.force_authenticate(User.objects.create_user('viewer', 'viewer@uni.edu', 'pw'))
+        ids = [student.pk for student in students]
+
+        for url in ('/api/students/', '/api/students-generic/', '/api/students-list-only/'):
+            with self.subTest(url=url):
+                response = client.get(url)
+                self.assertEqual([s['id'] for s in response.data['results']], ids)
+                self.assertIsNone(response.data['next_after'])
+
+        for student in students:
+            self.assertEqual(client.get(f'/api/students-generic/{student.pk}/').status_code, 200)
+            self.assertEqual(client.get(f'/api/students/email/{student.email}/').data['id'], student.pk)
+
+        course = self.courses[1]
+        response = client.get(f'/api/students/course/{course.course_code}/')
+        self.assertEqual(
+            [s['id'] for s in response.data['results']],
+            [s.pk for s in students if s.course_id == course.pk],
+        )
+        response = client.get('/api/students/course/NOPE/')
+        self.assertEqual(response.data['results'], [])
+
+    def test_changing_partition_key_is_rejected(self):
+        student = Student.objects.get_any(pk=self.create_student(0, self.courses[0]).pk)
+        student.course = self.courses[1]
+        with self.assertRaises(ValueError):
+            student.save()
@@ -24,6 +24,9 @@ from .views import (
     # 🧩 New — User Registration
     RegisterUserAPIView,
     CurrentUserAPIView,
+
+    # 📈 Metrics
+    MetricsAPIView,
 )
 from rest_framework.authtoken.views import obtain_auth_token
 from rest_framework_simplejwt.views import TokenObtainPairView, TokenRefreshView
@@ -71,4 +74,9 @@ urlpatterns = [
     # JWT auth (simplejwt)
     path('jwt/token/', TokenObtainPairView.as_view(), name='token_obtain_pair'),
     path('jwt/token/refresh/', TokenRefreshView.as_view(), name='token_refresh'),
+
+    # ==================================================
+    # 📈 METRICS (Prometheus text format, admin only)
+    # ==================================================
+    path('metrics/', MetricsAPIView.as_view(), name='metrics'),
 ]
@@ -1,7 +1,7 @@
 from rest_framework import generics, status
 from rest_framework.views import APIView
 from rest_framework.response import Response
-from rest_framework.permissions import IsAuthenticated, AllowAny
+from rest_framework.permissions import IsAuthenticated, IsAdminUser, AllowAny
 from rest_framework.authentication import TokenAuthentication
 from rest_framework_simplejwt.authentication import JWTAuthentication
 from .models import Student, Course
@@ -10,24 +10,85 @@ from .serializers import (
     CourseSerializer,
     CourseDetailSerializer,
     UserSerializer,
+    PreconditionFailed,
 )
+from .partitioning import is_partitioned
 from django.contrib.auth.models import User
+from django.http import Http404, HttpResponse
 from rest_framework.authtoken.models import Token
+from . import metrics
+
+
+# ===================================================
+# 🗂️ PARTITION-AWARE STUDENT HELPERS
+# ===================================================
+
+class PartitionedStudentListMixin:
+    """
+    Lists students from every partition.
+
+    With a single database and no ``?limit=``/``?after=`` the response is the
+    full list, as before. Otherwise it is one keyset page,
+    ``{"results": [...], "next_after": <id or null>}``, where ``limit``
+    defaults to 50 (at most 200) and ``next_after`` feeds the next ``?after=``.
+    """
+    page_size = 50
+    max_page_size = 200
+
+    def student_filters(self):
+        """Extra filters for the list; None means nothing can match."""
+        return {}
+
+    def list_students(self, request):
+        filters = self.student_filters()
+        params = request.query_params
+        if not is_partitioned() and 'limit' not in params and 'after' not in params:
+            students = Student.objects.fan_out(**filters) if filters is not None else []
+            serializer = StudentSerializer(students, many=True)
+            return Response(serializer.data, status=status.HTTP_200_OK)
+
+        try:
+            limit = int(params.get('limit', self.page_size))
+            after = int(params['after']) if 'after' in params else None
+        except ValueError:
+            return Response({"error": "limit and after must be integers"}, status=status.HTTP_400_BAD_REQUEST)
+        if not 1 <= limit <= self.max_page_size:
+            return Response(
+                {"error": f"limit must be between 1 and {self.max_page_size}"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        students, next_after = [], None
+        if filters is not None:
+            students, next_after = Student.objects.keyset_page(after=after, limit=limit, **filters)
+        serializer = StudentSerializer(students, many=True)
+        return Response({"results": serializer.data, "next_after": next_after}, status=status.HTTP_200_OK)
+
+
+class PartitionedStudentLookupMixin:
+    """``get_object`` for generic views that finds the student on any partition."""
+
+    def get_object(self):
+        lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+        try:
+            student = Student.objects.get_any(**{self.lookup_field: self.kwargs[lookup_url_kwarg]})
+        except Student.DoesNotExist:
+            raise Http404("Student not found")
+        self.check_object_permissions(self.request, student)
+        return student
 
 
 # ===================================================
 # 🧠 PART 1 — APIView IMPLEMENTATION (Manual CRUD)
 # ===================================================
 
-class StudentAPIView(APIView):
+class StudentAPIView(PartitionedStudentListMixin, APIView):
     """Handles GET (list) and POST (create) for students."""
     authentication_classes = [TokenAuthentication, JWTAuthentication]
     permission_classes = [IsAuthenticated]
 
     def get(self, request):
-        students = Student.objects.all()
-        serializer = StudentSerializer(students, many=True)
-        return Response(serializer.data, status=status.HTTP_200_OK)
+        return self.list_students(request)
 
     def post(self, request):
         serializer = StudentSerializer(data=request.data)
@@ -38,42 +99,56 @@ class StudentAPIView(APIView):
 
 
 class StudentDetailAPIView(APIView):
-    """Handles GET, PUT, PATCH, DELETE for a single student."""
+    """
+    Handles GET, PUT, PATCH, DELETE for a single student.
+
+    Responses carry the row version as an ETag. PUT/PATCH honour If-Match and
+    answer 412 if the student changed since the client read it.
+    """
     authentication_classes = [TokenAuthentication, JWTAuthentication]
     permission_classes = [IsAuthenticated]
 
     def get_object(self, pk):
         try:
-            return Student.objects.get(pk=pk)
+            return Student.objects.get_any(pk=pk)
         except Student.DoesNotExist:
             return None
 
-    def get(self, request, pk):
-        student = self.get_object(pk)
-        if not student:
-            return Response({"error": "Student not found"}, status=status.HTTP_404_NOT_FOUND)
+    def etag_matches(self, request, student):
+        if_match = request.headers.get('If-Match')
+        if not if_match:
+            return True
+        # If-Match uses the strong comparison, so weak (W/"...") tags never match.
+        tags = [tag.strip() for tag in if_match.split(',')]
+        return '*' in tags or f'"{student.version}"' in tags
+
+    def versioned_response(self, student):
         serializer = StudentSerializer(student)
-        return Response(serializer.data)
+        return Response(serializer.data, headers={'ETag': f'"{student.version}"'})
 
-    def put(self, request, pk):
+    def update(self, request, pk, partial):
         student = self.get_object(pk)
         if not student:
             return Response({"error": "Student not found"}, status=status.HTTP_404_NOT_FOUND)
-        serializer = StudentSerializer(student, data=request.data)
+        if not self.etag_matches(request, student):
+            raise PreconditionFailed()
+        serializer = StudentSerializer(student, data=request.data, partial=partial)
         if serializer.is_valid():
             serializer.save()
-            return Response(serializer.data)
+            return self.versioned_response(student)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
-    def patch(self, request, pk):
+    def get(self, request, pk):
         student = self.get_object(pk)
         if not student:
             return Response({"error": "Student not found"}, status=status.HTTP_404_NOT_FOUND)
-        serializer = StudentSerializer(student, data=request.data, partial=True)
-        if serializer.is_valid():
-            serializer.save()
-            return Response(serializer.data)
-        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        return self.versioned_response(student)
+
+    def put(self, request, pk):
+        return self.update(request, pk, partial=False)
+
+    def patch(self, request, pk):
+        return self.update(request, pk, partial=True)
 
     def delete(self, request, pk):
         student = self.get_object(pk)
@@ -125,7 +200,8 @@ class StudentsByCourseCodeAPIView(APIView):
     permission_classes = [IsAuthenticated]
 
     def get(self, request, course_code):
-        students = Student.objects.filter(course__course_code=course_code)
+        course = Course.objects.filter(course_code=course_code).first()
+        students = Student.objects.for_course(course.pk) if course else []
         serializer = StudentSerializer(students, many=True)
         return Response(serializer.data)
 
@@ -134,14 +210,17 @@ class StudentsByCourseCodeAPIView(APIView):
 # 🧠 PART 2 — GENERIC VIEWS IMPLEMENTATION
 # ===================================================
 
-class StudentListCreateView(generics.ListCreateAPIView):
+class StudentListCreateView(PartitionedStudentListMixin, generics.ListCreateAPIView):
     queryset = Student.objects.all()
     serializer_class = StudentSerializer
     authentication_classes = [TokenAuthentication, JWTAuthentication]
     permission_classes = [IsAuthenticated]
 
+    def list(self, request, *args, **kwargs):
+        return self.list_students(request)
+
 
-class StudentDetailView(generics.RetrieveUpdateDestroyAPIView):
+class StudentDetailView(PartitionedStudentLookupMixin, generics.RetrieveUpdateDestroyAPIView):
     queryset = Student.objects.all()
     serializer_class = StudentSerializer
     authentication_classes = [TokenAuthentication, JWTAuthentication]
@@ -155,12 +234,15 @@ class StudentCreateOnlyView(generics.CreateAPIView):
     permission_classes = [IsAuthenticated]
 
 
-class StudentListOnlyView(generics.ListAPIView):
+class StudentListOnlyView(PartitionedStudentListMixin, generics.ListAPIView):
     queryset = Student.objects.all()
     serializer_class = StudentSerializer
     authentication_classes = [TokenAuthentication, JWTAuthentication]
     permission_classes = [IsAuthenticated]
 
+    def list(self, request, *args, **kwargs):
+        return self.list_students(request)
+
 
 # ===================================================
 # 🎓 GENERIC COURSE VIEWS
@@ -184,7 +266,7 @@ class CourseDetailView(generics.RetrieveAPIView):
 # 🔍 PART 3 — LOOKUP FIELD DEMONSTRATIONS
 # ===================================================
 
-class StudentByEmailView(generics.RetrieveAPIView):
+class StudentByEmailView(PartitionedStudentLookupMixin, generics.RetrieveAPIView):
     queryset = Student.objects.all()
     serializer_class = StudentSerializer
     lookup_field = "email"
@@ -193,14 +275,20 @@ class StudentByEmailView(generics.RetrieveAPIView):
     permission_classes = [IsAuthenticated]
 
 
-class StudentByCourseView(generics.ListAPIView):
+class StudentByCourseView(PartitionedStudentListMixin, generics.ListAPIView):
     serializer_class = StudentSerializer
     authentication_classes = [TokenAuthentication, JWTAuthentication]
     permission_classes = [IsAuthenticated]
 
-    def get_queryset(self):
+    def student_filters(self):
+        # Courses live on 'default'; resolve the code there, then filter
+        # students by id so no cross-database join is needed.
         course_code = self.kwargs.get("course_code")
-        return Student.objects.filter(course__course_code=course_code)
+        course = Course.objects.filter(course_code=course_code).first()
+        return {'course_id': course.pk} if course else None
+
+    def list(self, request, *args, **kwargs):
+        return self.list_students(request)
 
 
 # ===================================================
@@ -246,3 +334,19 @@ class CurrentUserAPIView(APIView):
         }, status=status.HTTP_200_OK)
 
 
+
+
+# ===================================================
+# 📈 METRICS ENDPOINT (Admin only)
+# ===================================================
+
+class MetricsAPIView(APIView):
+    """Exposes request metrics in the Prometheus text format."""
+    authentication_classes = [TokenAuthentication, JWTAuthentication]
+    permission_classes = [IsAdminUser]
+
+    def get(self, request):
+        return HttpResponse(
+            metrics.render_text(),
+            content_type="text/plain; version=0.0.4; charset=utf-8",
+        )
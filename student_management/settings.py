@@ -50,6 +50,7 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'student_api.metrics.MetricsMiddleware',
 ]
 
 ROOT_URLCONF = 'student_management.urls'
@@ -78,9 +79,30 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
-    }
+    },
+    # Second partition database; only used once listed in STUDENT_PARTITIONS
+    # (and by the partitioning tests).
+    'students_1': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': BASE_DIR / 'students_1.sqlite3',
+    },
+}
+
+# Student partitioning. Students are routed to ALIASES[key % len(ALIASES)] where
+# the key is the course id or the enrollment year. To try it locally with the
+# second SQLite database above, set
+#   STUDENT_PARTITIONS['ALIASES'] = ['default', 'students_1']
+# then run the usual `migrate` followed by `migrate --database=students_1`; the
+# second run also copies the existing courses into the new partition and moves
+# existing students onto their partitions. After changing KEY or ALIASES later,
+# run `manage.py rebalance_students`.
+STUDENT_PARTITIONS = {
+    'KEY': 'course',  # or 'enrollment_year'
+    'ALIASES': ['default'],
 }
 
+DATABASE_ROUTERS = ['student_api.partitioning.StudentPartitionRouter']
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -138,3 +160,13 @@ SIMPLE_JWT = {
     'ACCESS_TOKEN_LIFETIME': None,  # keep default if package not installed; set to timedelta if desired
     # ... you can add settings like 'REFRESH_TOKEN_LIFETIME' if needed ...
 }
+
+# Request metrics exposed at /api/metrics/. Set DIR to a directory shared by all
+# worker processes so each one dumps its counters there and the endpoint can
+# aggregate them; leave it as None to report the serving process only. Dumps
+# of exited workers are folded into one file, so DIR does not grow with worker
+# recycling. The directory must be local to the host (pids are checked).
+STUDENT_API_METRICS = {
+    'DIR': None,
+    'FLUSH_INTERVAL': 5.0,  # seconds between per-process dumps
+}